@@ -1,14 +1,26 @@
-from flask import Flask
+from flask import Flask, make_response
 import dash
-from dash import html, dcc
+from dash import html, dcc, Patch
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import numpy as np
-import requests
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import os
+import threading
+import time
+import aiohttp
+import orjson
 from datetime import datetime, timedelta
 
+# Serialize figures in callback responses with orjson
+pio.json.config.default_engine = 'orjson'
+
 # Initialize Flask
 server = Flask(__name__)
 
@@ -28,9 +40,15 @@ app.title = "COVID-19 Analytics Dashboard"
 # Cache for storing fetched data
 data_cache = {
     'data': None,
-    'last_fetch': None
+    'last_fetch': None,  # time.monotonic() of the last fetch attempt
+    'updated': None,     # upstream 'updated' timestamp (ms) of the cached data
+    'etag': None,        # validators of the cached countries response
+    'last_modified': None
 }
 
+# Ensures only one thread refreshes the cache at a time
+_refresh_lock = threading.Lock()
+
 # Theme-specific styles
 THEME_STYLES = {
     'DARKLY': {
@@ -65,15 +83,6 @@ THEME_STYLES = {
     }
 }
 
-def calculate_trend(current, previous):
-    """Calculate percentage trend with proper error handling"""
-    try:
-        if previous == 0 or previous is None:
-            return 0
-        return ((current - previous) / previous) * 100
-    except (TypeError, ZeroDivisionError):
-        return 0
-
 def safe_division(a, b, default=0):
     """Safely divide two numbers, returning default if division is not possible"""
     try:
@@ -83,97 +92,215 @@ def safe_division(a, b, default=0):
     except (TypeError, ZeroDivisionError):
         return default
 
+# disease.sh endpoints: current and yesterday's data per country and globally
+API_URLS = [
+    "https://disease.sh/v3/covid-19/countries",
+    "https://disease.sh/v3/covid-19/countries?yesterday=true",
+    "https://disease.sh/v3/covid-19/all",
+    "https://disease.sh/v3/covid-19/all?yesterday=true"
+]
+
+HTTP_TIMEOUT = 10  # seconds, per request
+
+# Long-lived event loop and HTTP session so connections to disease.sh are kept alive.
+# Started lazily per process, since threads do not survive a fork (e.g. gunicorn workers).
+_http_loop = None
+_http_thread = None
+_http_pid = None
+_http_session = None
+_http_start_lock = threading.Lock()
+
+def _get_http_loop():
+    """Return this process's HTTP event loop, starting its thread if needed"""
+    global _http_loop, _http_thread, _http_pid, _http_session
+    with _http_start_lock:
+        if _http_pid != os.getpid() or not _http_thread.is_alive():
+            _http_loop = asyncio.new_event_loop()
+            _http_thread = threading.Thread(target=_http_loop.run_forever, daemon=True)
+            _http_thread.start()
+            _http_pid = os.getpid()
+            _http_session = None
+        return _http_loop
+
+async def _get_http_session():
+    """Return the shared aiohttp session, creating it on the HTTP loop if needed"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            headers={'Accept': 'application/json'}
+        )
+    return _http_session
+
+@atexit.register
+def _close_http_session():
+    """Close the shared HTTP session on its loop when the process exits"""
+    if _http_session is None or _http_session.closed or _http_pid != os.getpid():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_http_session.close(), _http_loop).result(timeout=5)
+    except Exception as e:
+        print(f"Error closing HTTP session: {e}")
+
+async def _fetch_json(session, url, headers=None):
+    """GET a single endpoint, returning its JSON (None if not modified) and headers"""
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            return None, response.headers
+        return orjson.loads(await response.read()), response.headers
+
+async def _fetch_all(countries_headers=None):
+    """Fetch all API endpoints concurrently, sending conditional headers for the countries list"""
+    session = await _get_http_session()
+    return await asyncio.gather(
+        _fetch_json(session, API_URLS[0], countries_headers),
+        *(_fetch_json(session, url) for url in API_URLS[1:])
+    )
+
+def _empty_data():
+    """Return an empty data structure with zeros, used when no data is available"""
+    return {
+        'countries': np.array([], dtype=object),
+        'cases': np.array([], dtype=np.float32),
+        'active': np.array([], dtype=np.float32),
+        'recovered': np.array([], dtype=np.float32),
+        'deaths': np.array([], dtype=np.float32),
+        'iso3': np.array([], dtype=object),
+        'cases_per_million': np.array([], dtype=np.float32),
+        'deaths_per_million': np.array([], dtype=np.float32),
+        'tests_per_million': np.array([], dtype=np.float32),
+        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC'),
+        'new_cases': 0,
+        'new_deaths': 0,
+        'new_recovered': 0,
+        'cases_trend': 0,
+        'deaths_trend': 0,
+        'recovered_trend': 0,
+        'total_cases': 0.0,
+        'active_total': 0.0,
+        'recovered_total': 0.0,
+        'deaths_total': 0.0,
+        'max_cases': 0.0
+    }
+
+def _cache_is_fresh():
+    """Check whether cached data exists and is less than 15 minutes old"""
+    return (
+        data_cache['data'] is not None
+        and data_cache['last_fetch'] is not None
+        and time.monotonic() - data_cache['last_fetch'] < 900  # 15 minutes
+    )
+
 def fetch_covid_data(force=False):
     """Fetch data with caching and error handling"""
-    now = datetime.now()
+    if not force and _cache_is_fresh():
+        return data_cache['data']
     
-    # Return cached data if it's less than 15 minutes old (increased from 5 minutes)
-    if not force and data_cache['data'] is not None and data_cache['last_fetch'] is not None:
-        if (now - data_cache['last_fetch']).total_seconds() < 900:  # 15 minutes
+    # Single-flight refresh: while one thread fetches, others get the stale snapshot.
+    # Only wait, for a bounded time, when there is nothing cached to serve yet.
+    if data_cache['data'] is None:
+        acquired = _refresh_lock.acquire(timeout=HTTP_TIMEOUT + 5)
+    else:
+        acquired = _refresh_lock.acquire(blocking=False)
+    if not acquired:
+        return data_cache['data'] if data_cache['data'] is not None else _empty_data()
+    try:
+        # Another thread may have refreshed the cache while we waited
+        if not force and _cache_is_fresh():
             return data_cache['data']
+        return _refresh_covid_data(force)
+    finally:
+        _refresh_lock.release()
+
+def _refresh_covid_data(force):
+    """Fetch and process fresh data, falling back to the cache on errors"""
+    now = datetime.now()
     
     try:
-        # Use a session for connection pooling
-        session = requests.Session()
-        
-        # Set timeout for requests
-        timeout = 10  # seconds
-        
-        # Current data
-        url = "https://disease.sh/v3/covid-19/countries"
-        response = session.get(url, timeout=timeout)
-        data = response.json()
-        
-        # Yesterday's data for trends
-        yesterday_url = "https://disease.sh/v3/covid-19/countries?yesterday=true"
-        yesterday_response = session.get(yesterday_url, timeout=timeout)
-        yesterday_data = yesterday_response.json()
+        # Only ask for the countries list if it changed since the cached snapshot
+        countries_headers = {}
+        if not force and data_cache['data'] is not None:
+            if data_cache['etag']:
+                countries_headers['If-None-Match'] = data_cache['etag']
+            if data_cache['last_modified']:
+                countries_headers['If-Modified-Since'] = data_cache['last_modified']
         
-        # Get global data for timestamp and trends
-        global_data = session.get('https://disease.sh/v3/covid-19/all', timeout=timeout).json()
-        global_yesterday = session.get('https://disease.sh/v3/covid-19/all?yesterday=true', timeout=timeout).json()
+        # Fetch all endpoints concurrently, never waiting much longer than the HTTP timeout
+        future = asyncio.run_coroutine_threadsafe(_fetch_all(countries_headers), _get_http_loop())
+        try:
+            results = future.result(timeout=HTTP_TIMEOUT + 2)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+        (
+            (data, response_headers),
+            (yesterday_data, _),
+            (global_data, _),
+            (global_yesterday, _)
+        ) = results
         
-        # Close the session
-        session.close()
-        
-        # Process data using numpy for better performance
-        countries = []
-        cases_data = []
-        active_data = []
-        recovered_data = []
-        deaths_data = []
-        tests_data = []
-        population_data = []
-        iso3_data = []
+        # Countries list not modified, keep the cached snapshot
+        if data is None:
+            data_cache['last_fetch'] = time.monotonic()
+            return data_cache['data']
         
-        # Pre-allocate numpy arrays for better performance
+        # Extract each field in a single vectorized pass
         n = len(data)
-        cases = np.zeros(n)
-        active = np.zeros(n)
-        recovered = np.zeros(n)
-        deaths = np.zeros(n)
-        tests = np.zeros(n)
-        population = np.ones(n)  # Default to 1 to avoid division by zero
+        countries = [d.get('country', 'Unknown') for d in data]
+        iso3_data = [(d.get('countryInfo') or {}).get('iso3', 'Unknown') for d in data]
+        # Object arrays allow fancy indexing of names alongside the numeric arrays
+        countries = np.array(countries, dtype=object)
+        iso3_data = np.array(iso3_data, dtype=object)
+        cases = np.fromiter((d.get('cases', 0) or 0 for d in data), dtype=np.float64, count=n)
+        active = np.fromiter((d.get('active', 0) or 0 for d in data), dtype=np.float64, count=n)
+        recovered = np.fromiter((d.get('recovered', 0) or 0 for d in data), dtype=np.float64, count=n)
+        deaths = np.fromiter((d.get('deaths', 0) or 0 for d in data), dtype=np.float64, count=n)
+        tests = np.fromiter((d.get('tests', 0) or 0 for d in data), dtype=np.float32, count=n)
+        population = np.fromiter((d.get('population', 1) or 0 for d in data), dtype=np.float32, count=n)
+        
+        # Global aggregates, computed once per snapshot from the exact counts
+        total_cases = float(cases.sum())
+        active_total = float(active.sum())
+        recovered_total = float(recovered.sum())
+        deaths_total = float(deaths.sum())
+        max_cases = float(cases.max()) if n else 0.0
         
-        for i, item in enumerate(data):
-            try:
-                countries.append(item.get('country', 'Unknown'))
-                cases[i] = item.get('cases', 0)
-                active[i] = item.get('active', 0)
-                recovered[i] = item.get('recovered', 0)
-                deaths[i] = item.get('deaths', 0)
-                tests[i] = item.get('tests', 0)
-                population[i] = item.get('population', 1)
-                iso3_data.append(item.get('countryInfo', {}).get('iso3', 'Unknown'))
-            except (KeyError, TypeError):
-                continue
+        # Store per-country counts as float32; values above 2**24 get rounded by a few units
+        cases = cases.astype(np.float32)
+        active = active.astype(np.float32)
+        recovered = recovered.astype(np.float32)
+        deaths = deaths.astype(np.float32)
         
-        # Vectorized operations for per million calculations
-        cases_per_million = np.divide(cases, population, where=population!=0) * 1_000_000
-        deaths_per_million = np.divide(deaths, population, where=population!=0) * 1_000_000
-        tests_per_million = np.divide(tests, population, where=population!=0) * 1_000_000
+        # Vectorized per million calculations using a shared scaled reciprocal
+        inv_pop_m = 1_000_000.0 / np.where(population > 0, population, 1.0)  # Avoid division by zero
+        cases_per_million = cases * inv_pop_m
+        deaths_per_million = deaths * inv_pop_m
+        tests_per_million = tests * inv_pop_m
         
         # Calculate trends using numpy operations
         new_cases = global_data.get('todayCases', 0)
         new_deaths = global_data.get('todayDeaths', 0)
         new_recovered = global_data.get('todayRecovered', 0)
         
-        cases_trend = calculate_trend(
-            global_data.get('cases', 0),
-            global_yesterday.get('cases', 0)
-        )
-        deaths_trend = calculate_trend(
-            global_data.get('deaths', 0),
-            global_yesterday.get('deaths', 0)
-        )
-        recovered_trend = calculate_trend(
-            global_data.get('recovered', 0),
-            global_yesterday.get('recovered', 0)
-        )
+        trend_keys = ('cases', 'deaths', 'recovered')
+        cur = np.array([global_data.get(k, 0) or 0 for k in trend_keys], dtype=np.float64)
+        prev = np.array([global_yesterday.get(k, 0) or 0 for k in trend_keys], dtype=np.float64)
+        trends = np.where(prev > 0, (cur - prev) / np.where(prev > 0, prev, 1.0) * 100.0, 0.0)
+        cases_trend, deaths_trend, recovered_trend = trends.tolist()
+        
+        updated = global_data.get('updated', now.timestamp() * 1000)
+        last_updated = datetime.fromtimestamp(updated / 1000).strftime('%Y-%m-%d %H:%M:%S UTC')
         
-        last_updated = datetime.fromtimestamp(
-            global_data.get('updated', now.timestamp() * 1000) / 1000
-        ).strftime('%Y-%m-%d %H:%M:%S UTC')
+        # Only replace the cache if the new snapshot is newer and not noticeably emptier
+        old_data = data_cache['data']
+        if old_data is not None and (
+            len(countries) < len(old_data['countries']) * 0.9
+            or updated <= data_cache['updated']
+        ):
+            print(f"Keeping cached data: received {len(countries)} countries updated at {last_updated}")
+            data_cache['last_fetch'] = time.monotonic()
+            return old_data
         
         data = {
             'countries': countries,
@@ -191,11 +318,19 @@ def fetch_covid_data(force=False):
             'new_recovered': new_recovered,
             'cases_trend': cases_trend,
             'deaths_trend': deaths_trend,
-            'recovered_trend': recovered_trend
+            'recovered_trend': recovered_trend,
+            'total_cases': total_cases,
+            'active_total': active_total,
+            'recovered_total': recovered_total,
+            'deaths_total': deaths_total,
+            'max_cases': max_cases
         }
         
         data_cache['data'] = data
-        data_cache['last_fetch'] = now
+        data_cache['last_fetch'] = time.monotonic()
+        data_cache['updated'] = updated
+        data_cache['etag'] = response_headers.get('ETag')
+        data_cache['last_modified'] = response_headers.get('Last-Modified')
         return data
         
     except Exception as e:
@@ -203,28 +338,15 @@ def fetch_covid_data(force=False):
         if data_cache['data'] is not None:
             return data_cache['data']
         
-        # Return empty data structure with zeros
-        return {
-            'countries': [],
-            'cases': np.array([]),
-            'active': np.array([]),
-            'recovered': np.array([]),
-            'deaths': np.array([]),
-            'iso3': [],
-            'cases_per_million': np.array([]),
-            'deaths_per_million': np.array([]),
-            'tests_per_million': np.array([]),
-            'last_updated': now.strftime('%Y-%m-%d %H:%M:%S UTC'),
-            'new_cases': 0,
-            'new_deaths': 0,
-            'new_recovered': 0,
-            'cases_trend': 0,
-            'deaths_trend': 0,
-            'recovered_trend': 0
-        }
+        return _empty_data()
+
+# Card styles only depend on the theme, so build them once per theme
+_CARD_STYLE = {theme: {'backgroundColor': styles['card_bg']} for theme, styles in THEME_STYLES.items()}
+_MUTED = {theme: {'color': styles['muted_color']} for theme, styles in THEME_STYLES.items()}
+_CARD_VALUE_STYLE = {'fontWeight': '600'}
 
 def create_card(title, value, subtitle, trend=None, color="primary", theme='DARKLY'):
-    styles = THEME_STYLES[theme]
+    muted = _MUTED[theme]
     
     trend_element = None
     if trend is not None:
@@ -239,51 +361,90 @@ def create_card(title, value, subtitle, trend=None, color="primary", theme='DARK
         dbc.CardBody([
             html.H4(title, 
                    className="card-title text-center",
-                   style={'color': styles['muted_color']}),
-            html.H2(f"{value:,}", 
+                   style=muted),
+            html.H2(format(value, ',.0f'), 
                    className=f"card-text text-center text-{color}",
-                   style={'fontWeight': '600'}),
+                   style=_CARD_VALUE_STYLE),
             html.P(subtitle, 
                   className="text-center small mt-2",
-                  style={'color': styles['muted_color']}),
+                  style=muted),
             trend_element if trend_element else None
         ])
-    ], className="mb-4 shadow-sm", style={'backgroundColor': styles['card_bg']})
+    ], className="mb-4 shadow-sm", style=_CARD_STYLE[theme])
 
-def create_map_figure(map_data, theme):
-    styles = THEME_STYLES[theme]
-    
-    # Calculate distribution breaks for better visualization
-    max_cases = max(map_data['cases'])
-    breaks = [
-        0,
-        20_000_000,  # 20M
-        40_000_000,  # 40M
-        60_000_000,  # 60M
-        80_000_000,  # 80M
-        100_000_000, # 100M
-        max_cases
-    ]
-    
-    # Create normalized color stops
-    color_stops = []
-    for i, value in enumerate(breaks):
-        normalized = i / (len(breaks) - 1)
-        color_stops.append([normalized, get_color_for_value(normalized)])
+def create_cards(data, theme):
+    """Create the seven global stat cards for the given data and theme"""
+    total_card = create_card(
+        "Total Cases",
+        data['total_cases'],
+        "Cumulative cases worldwide",
+        data['cases_trend'],
+        "primary",
+        theme
+    )
+    active_card = create_card(
+        "Active Cases",
+        data['active_total'],
+        "Currently infected patients",
+        None,
+        "warning",
+        theme
+    )
+    recovered_card = create_card(
+        "Recovered",
+        data['recovered_total'],
+        "Total recovered patients",
+        data['recovered_trend'],
+        "success",
+        theme
+    )
+    deaths_card = create_card(
+        "Deaths",
+        data['deaths_total'],
+        "Total fatalities",
+        data['deaths_trend'],
+        "danger",
+        theme
+    )
     
-    # Create choropleth map
-    map_fig = px.choropleth(
-        map_data,
-        locations='iso3',
-        color='cases',
-        hover_name='country',
-        range_color=[0, max_cases],
-        color_continuous_scale=color_stops,
-        custom_data=['cases_per_million']
+    new_cases_card = create_card(
+        "New Cases",
+        data['new_cases'],
+        "Cases reported today",
+        None,
+        "info",
+        theme
+    )
+    new_recovered_card = create_card(
+        "New Recoveries",
+        data['new_recovered'],
+        "Recoveries reported today",
+        None,
+        "success",
+        theme
+    )
+    new_deaths_card = create_card(
+        "New Deaths",
+        data['new_deaths'],
+        "Deaths reported today",
+        None,
+        "danger",
+        theme
     )
     
-    # Add border around the map
-    border_color = styles['muted_color']
+    return [
+        total_card,
+        active_card,
+        recovered_card,
+        deaths_card,
+        new_cases_card,
+        new_recovered_card,
+        new_deaths_card
+    ]
+
+def _build_map_layout(styles):
+    """Build the static map layout for a theme"""
+    # Border around the map
     border_style = {
         'type': 'rect',
         'xref': 'paper',
@@ -293,15 +454,14 @@ def create_map_figure(map_data, theme):
         'x1': 1.05,
         'y1': 1.05,
         'line': {
-            'color': border_color,
+            'color': styles['muted_color'],
             'width': 2,
         },
         'fillcolor': 'rgba(0,0,0,0)',
         'layer': 'below'
     }
     
-    # Update layout for better visibility
-    map_fig.update_layout(
+    return dict(
         margin=dict(l=20, r=20, t=20, b=20),
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)',
@@ -310,7 +470,7 @@ def create_map_figure(map_data, theme):
             framecolor=styles['muted_color'],
             framewidth=2,
             showcoastlines=True,
-            projection_type='equirectangular',
+            projection=dict(type='equirectangular'),
             coastlinecolor=styles['text_color'],
             showland=True,
             landcolor=styles['bg_color'],
@@ -327,8 +487,7 @@ def create_map_figure(map_data, theme):
         font=dict(color=styles['text_color']),
         hoverlabel=dict(
             bgcolor=styles['hover_bg'],
-            font_size=12,
-            font_family="Arial"
+            font=dict(size=12, family="Arial")
         ),
         coloraxis_colorbar=dict(
             title="Total Cases",
@@ -345,8 +504,120 @@ def create_map_figure(map_data, theme):
             tickcolor=styles['text_color'],
             tickfont=dict(color=styles['text_color']),
             titlefont=dict(color=styles['text_color']),
-            tickvals=breaks,
-            ticktext=[
+            tickmode='array'
+        )
+    )
+
+def _build_bar_layout(styles):
+    """Build the static top-countries bar chart layout for a theme"""
+    return dict(
+        showlegend=False,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=40, r=20, t=40, b=0),
+        xaxis_tickangle=-45,
+        yaxis_title="Total Cases",
+        xaxis_title="",
+        font=dict(color=styles['text_color']),
+        hoverlabel=dict(
+            bgcolor=styles['hover_bg'],
+            font=dict(size=12, family="Arial")
+        )
+    )
+
+def _build_pie_layout(styles):
+    """Build the static case distribution pie chart layout for a theme"""
+    return dict(
+        showlegend=True,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color=styles['text_color'])
+        ),
+        font=dict(color=styles['text_color']),
+        hoverlabel=dict(
+            bgcolor=styles['hover_bg'],
+            font=dict(size=12, family="Arial")
+        )
+    )
+
+# Figure layouts only depend on the theme, so build them once per theme
+_MAP_LAYOUT = {theme: _build_map_layout(styles) for theme, styles in THEME_STYLES.items()}
+_BAR_LAYOUT = {theme: _build_bar_layout(styles) for theme, styles in THEME_STYLES.items()}
+_PIE_LAYOUT = {theme: _build_pie_layout(styles) for theme, styles in THEME_STYLES.items()}
+
+def restyle_figures(theme):
+    """Build patches that recolor the existing map, bar and pie figures for a theme"""
+    # Patches reach plotly.js unvalidated, so patched layout fragments must use
+    # nested dicts rather than plotly.py's underscore shorthand
+    styles = THEME_STYLES[theme]
+    
+    map_layout = _MAP_LAYOUT[theme]
+    map_patch = Patch()
+    for key in ('geo', 'shapes', 'font', 'hoverlabel'):
+        map_patch['layout'][key] = map_layout[key]
+    colorbar = map_patch['layout']['coloraxis']['colorbar']
+    colorbar['tickcolor'] = styles['text_color']
+    colorbar['tickfont'] = dict(color=styles['text_color'])
+    colorbar['title']['font'] = dict(color=styles['text_color'])
+    
+    bar_layout = _BAR_LAYOUT[theme]
+    bar_patch = Patch()
+    for key in ('font', 'hoverlabel'):
+        bar_patch['layout'][key] = bar_layout[key]
+    
+    pie_layout = _PIE_LAYOUT[theme]
+    pie_patch = Patch()
+    for key in ('font', 'hoverlabel', 'legend'):
+        pie_patch['layout'][key] = pie_layout[key]
+    pie_patch['data'][0]['marker']['colors'] = [styles['warning_color'], styles['success_color'], styles['danger_color']]
+    pie_patch['data'][0]['textfont'] = dict(color=styles['text_color'])
+    
+    return map_patch, bar_patch, pie_patch
+
+def create_map_figure(data, theme):
+    # Calculate distribution breaks for better visualization
+    max_cases = data['max_cases']
+    breaks = [
+        0,
+        20_000_000,  # 20M
+        40_000_000,  # 40M
+        60_000_000,  # 60M
+        80_000_000,  # 80M
+        100_000_000, # 100M
+        max_cases
+    ]
+    
+    # Create choropleth map straight from the cached arrays
+    map_fig = go.Figure(go.Choropleth(
+        locations=data['iso3'],
+        z=data['cases'],
+        hovertext=data['countries'],
+        customdata=data['cases_per_million'].reshape(-1, 1),
+        coloraxis='coloraxis',
+        hovertemplate="<b>%{hovertext}</b><br>" +
+                     "Total Cases: %{z:,.0f}<br>" +
+                     "Cases per Million: %{customdata[0]:,.0f}" +
+                     "<extra></extra>"
+    ))
+    
+    # Apply the cached theme layout; only the color range and ticks depend on the data
+    layout = _MAP_LAYOUT[theme]
+    map_fig.update_layout(**{
+        **layout,
+        'coloraxis_colorscale': _COLOR_STOPS,
+        'coloraxis_cmin': 0,
+        'coloraxis_cmax': max_cases,
+        'coloraxis_colorbar': {
+            **layout['coloraxis_colorbar'],
+            'tickvals': breaks,
+            'ticktext': [
                 '0',
                 '20M',
                 '40M',
@@ -354,55 +625,35 @@ def create_map_figure(map_data, theme):
                 '80M',
                 '100M',
                 f'{int(max_cases/1_000_000)}M'
-            ],
-            tickmode='array'
-        )
-    )
-    
-    map_fig.update_traces(
-        hovertemplate="<b>%{hovertext}</b><br>" +
-                     "Total Cases: %{z:,.0f}<br>" +
-                     "Cases per Million: %{customdata[0]:,.0f}"
-    )
+            ]
+        }
+    })
     
     return map_fig
 
+# Map palette from deep purple to deep orange as RGB rows, evenly spaced over [0, 1]
+_PALETTE = np.array([
+    (0x4a, 0x14, 0x8c),  # Deep purple
+    (0x7b, 0x1f, 0xa2),  # Purple
+    (0x9c, 0x27, 0xb0),  # Light purple
+    (0xe9, 0x1f, 0x63),  # Pink
+    (0xf4, 0x43, 0x36),  # Red
+    (0xff, 0x57, 0x22)   # Deep Orange
+], dtype=np.float32)
+_STOPS = np.linspace(0, 1, len(_PALETTE))
+
+def get_colors_for_values(values):
+    """Get interpolated RGB channels for normalized values between 0 and 1"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.stack([np.interp(values, _STOPS, _PALETTE[:, c]) for c in range(3)], axis=-1)
+
 def get_color_for_value(value):
     """Get color for normalized value between 0 and 1"""
-    colors = [
-        '#4a148c',  # Deep purple
-        '#7b1fa2',  # Purple
-        '#9c27b0',  # Light purple
-        '#e91e63',  # Pink
-        '#f44336',  # Red
-        '#ff5722'   # Deep Orange
-    ]
-    
-    # Calculate which color pair to use
-    num_colors = len(colors) - 1
-    segment = value * num_colors
-    i = int(segment)
-    
-    # Handle edge cases
-    if i >= num_colors:
-        return colors[-1]
-    if i < 0:
-        return colors[0]
-    
-    # Interpolate between colors
-    t = segment - i
-    c1 = colors[i]
-    c2 = colors[i + 1]
-    
-    # Convert hex to RGB and interpolate
-    r1, g1, b1 = int(c1[1:3], 16), int(c1[3:5], 16), int(c1[5:7], 16)
-    r2, g2, b2 = int(c2[1:3], 16), int(c2[3:5], 16), int(c2[5:7], 16)
-    
-    r = int(r1 * (1 - t) + r2 * t)
-    g = int(g1 * (1 - t) + g2 * t)
-    b = int(b1 * (1 - t) + b2 * t)
-    
-    return f'#{r:02x}{g:02x}{b:02x}'
+    rgb = get_colors_for_values(value)
+    return '#%02x%02x%02x' % tuple(rgb.astype(int))
+
+# Normalized color stops for the map's seven breaks, computed once at import
+_COLOR_STOPS = [[i / 6, get_color_for_value(i / 6)] for i in range(7)]
 
 # App layout with theme switching
 app.layout = html.Div([
@@ -545,9 +796,6 @@ app.layout = html.Div([
     [State("theme-store", "data")]
 )
 def toggle_theme(n_clicks, current_theme):
-    if n_clicks is None:
-        n_clicks = 0
-    
     # Toggle theme
     new_theme = 'FLATLY' if current_theme == 'DARKLY' else 'DARKLY'
     styles = THEME_STYLES[new_theme]
@@ -593,6 +841,19 @@ def toggle_theme(n_clicks, current_theme):
     
     return new_theme, styles['icon'], button_style, content_style
 
+@functools.lru_cache(maxsize=2)
+def _card_style(theme):
+    """Card column style for a theme, shared by all cards"""
+    styles = THEME_STYLES[theme]
+    return {
+        'backgroundColor': styles['card_bg'],
+        'color': styles['text_color'],
+        'transition': 'all 0.3s ease',
+        'border': 'none',
+        'borderRadius': '10px',
+        'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)'
+    }
+
 # Additional callback for updating card styles
 @app.callback(
     [Output("total-cases-card", "style"),
@@ -602,18 +863,14 @@ def toggle_theme(n_clicks, current_theme):
      Output("new-cases-card", "style"),
      Output("new-recovered-card", "style"),
      Output("new-deaths-card", "style")],
-    [Input("theme-store", "data")]
+    [Input("theme-store", "data")],
+    [State("total-cases-card", "style")]
 )
-def update_card_styles(theme):
-    styles = THEME_STYLES[theme]
-    card_style = {
-        'backgroundColor': styles['card_bg'],
-        'color': styles['text_color'],
-        'transition': 'all 0.3s ease',
-        'border': 'none',
-        'borderRadius': '10px',
-        'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)'
-    }
+def update_card_styles(theme, current_style):
+    card_style = _card_style(theme)
+    # Cards already carry this theme's style in this browser
+    if current_style == card_style:
+        return [dash.no_update] * 7
     return [card_style] * 7  # Return same style for all cards
 
 # Main dashboard callback
@@ -630,94 +887,36 @@ def update_card_styles(theme):
      Output("top-countries-bar", "figure"),
      Output("cases-pie", "figure")],
     [Input("interval-component", "n_intervals"),
-     Input("theme-store", "data")]
+     Input("theme-store", "data")],
+    [State("last-updated", "children")]
 )
-def update_dashboard(_, theme):
+def update_dashboard(_, theme, shown_last_updated):
     data = fetch_covid_data()
     styles = THEME_STYLES[theme]
     
     last_updated_text = f"Last Updated: {data['last_updated']}"
     
-    # Calculate global stats
-    total_cases = np.sum(data['cases'])
-    active_cases = np.sum(data['active'])
-    recovered = np.sum(data['recovered'])
-    deaths = np.sum(data['deaths'])
-    
-    # Create cards with current theme
-    total_card = create_card(
-        "Total Cases",
-        total_cases,
-        "Cumulative cases worldwide",
-        data['cases_trend'],
-        "primary",
-        theme
-    )
-    active_card = create_card(
-        "Active Cases",
-        active_cases,
-        "Currently infected patients",
-        None,
-        "warning",
-        theme
-    )
-    recovered_card = create_card(
-        "Recovered",
-        recovered,
-        "Total recovered patients",
-        data['recovered_trend'],
-        "success",
-        theme
-    )
-    deaths_card = create_card(
-        "Deaths",
-        deaths,
-        "Total fatalities",
-        data['deaths_trend'],
-        "danger",
-        theme
-    )
-    
-    new_cases_card = create_card(
-        "New Cases",
-        data['new_cases'],
-        "Cases reported today",
-        None,
-        "info",
-        theme
-    )
-    new_recovered_card = create_card(
-        "New Recoveries",
-        data['new_recovered'],
-        "Recoveries reported today",
-        None,
-        "success",
-        theme
-    )
-    new_deaths_card = create_card(
-        "New Deaths",
-        data['new_deaths'],
-        "Deaths reported today",
-        None,
-        "danger",
-        theme
-    )
+    # A theme change for the data already on screen only needs recoloring:
+    # rebuild the cheap cards and patch the existing figures' colors
+    if dash.ctx.triggered_id == "theme-store" and shown_last_updated == last_updated_text:
+        return (
+            dash.no_update,
+            *create_cards(data, theme),
+            *restyle_figures(theme)
+        )
     
     # Create world map
-    map_data = {
-        'country': data['countries'],
-        'iso3': data['iso3'],
-        'cases': data['cases'],
-        'cases_per_million': data['cases_per_million']
-    }
-    map_fig = create_map_figure(map_data, theme)
+    map_fig = create_map_figure(data, theme)
     
     # Create top 10 countries bar chart
-    top_10_indices = np.argsort(data['cases'])[-10:][::-1]
+    # Partition out the top 10 in O(n), then sort only those
+    k = min(10, len(data['cases']))
+    top_k = np.argpartition(data['cases'], -k)[-k:] if k else np.arange(0)
+    top_10_indices = top_k[np.argsort(data['cases'][top_k])[::-1]]
     bar_data = {
-        'country': [data['countries'][i] for i in top_10_indices],
-        'cases': [data['cases'][i] for i in top_10_indices],
-        'cases_per_million': [data['cases_per_million'][i] for i in top_10_indices]
+        'country': data['countries'][top_10_indices],
+        'cases': data['cases'][top_10_indices],
+        'cases_per_million': data['cases_per_million'][top_10_indices]
     }
     bar_fig = px.bar(
         bar_data,
@@ -727,21 +926,7 @@ def update_dashboard(_, theme):
         color_continuous_scale="Viridis",
         custom_data=['cases_per_million']
     )
-    bar_fig.update_layout(
-        showlegend=False,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=40, r=20, t=40, b=0),
-        xaxis_tickangle=-45,
-        yaxis_title="Total Cases",
-        xaxis_title="",
-        font=dict(color=styles['text_color']),
-        hoverlabel=dict(
-            bgcolor=styles['hover_bg'],
-            font_size=12,
-            font_family="Arial"
-        )
-    )
+    bar_fig.update_layout(**_BAR_LAYOUT[theme])
     bar_fig.update_traces(
         hovertemplate="<b>%{x}</b><br>" +
                      "Total Cases: %{y:,.0f}<br>" +
@@ -751,30 +936,11 @@ def update_dashboard(_, theme):
     # Create pie chart
     pie_fig = go.Figure(data=[go.Pie(
         labels=['Active', 'Recovered', 'Deaths'],
-        values=[active_cases, recovered, deaths],
+        values=[data['active_total'], data['recovered_total'], data['deaths_total']],
         hole=.4,
         marker=dict(colors=[styles['warning_color'], styles['success_color'], styles['danger_color']])
     )])
-    pie_fig.update_layout(
-        showlegend=True,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=20, r=20, t=40, b=20),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(color=styles['text_color'])
-        ),
-        font=dict(color=styles['text_color']),
-        hoverlabel=dict(
-            bgcolor=styles['hover_bg'],
-            font_size=12,
-            font_family="Arial"
-        )
-    )
+    pie_fig.update_layout(**_PIE_LAYOUT[theme])
     pie_fig.update_traces(
         textinfo='percent+value',
         hoverinfo='label+percent+value',
@@ -783,22 +949,14 @@ def update_dashboard(_, theme):
     
     return (
         last_updated_text,
-        total_card,
-        active_card,
-        recovered_card,
-        deaths_card,
-        new_cases_card,
-        new_recovered_card,
-        new_deaths_card,
+        *create_cards(data, theme),
         map_fig,
         bar_fig,
         pie_fig
     )
 
-# Flask routes
-@server.route('/')
-def index():
-    return """
+# Landing page served at the site root
+_INDEX_HTML = """
     <html>
         <head>
             <title>COVID-19 Analytics Dashboard</title>
@@ -892,5 +1050,13 @@ def index():
     </html>
     """
 
+# Flask routes
+@server.route('/')
+def index():
+    response = make_response(_INDEX_HTML)
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    return response
+
 if __name__ == '__main__':
     server.run(debug=True) 
\ No newline at end of file